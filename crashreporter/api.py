@@ -1,34 +1,147 @@
 __author__ = 'calvin'
 
 import requests
+import gzip
 import json
 import logging
 
+from cStringIO import StringIO
+
+try:
+    import ujson
+    _UJSON_INSTALLED = True
+except ImportError:
+    _UJSON_INSTALLED = False
+
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.util.retry import Retry
+
 
 HQ_DEFAULT_TIMEOUT = 10
 SMTP_DEFAULT_TIMEOUT = 5
 
+# Compact encoder: no whitespace separators and no \uXXXX escaping of non-ASCII text, so upload
+# bodies are smaller and encoding skips per-call keyword parsing in json.dumps.
+_encoder = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False)
+
+
+def _encode(payload):
+    if _UJSON_INSTALLED:
+        # ujson serializes in C, several times faster than the stdlib for the dict/string trees
+        # typical of crash payloads
+        data = ujson.dumps(payload, ensure_ascii=False)
+    else:
+        data = _encoder.encode(payload)
+    if isinstance(data, unicode):
+        data = data.encode('utf-8')
+    return data
+
+
+def _gzip_bytes(data):
+    buf = StringIO()
+    gz = gzip.GzipFile(fileobj=buf, mode='wb', compresslevel=6)
+    gz.write(data)
+    gz.close()
+    return buf.getvalue()
+
+
+def _gzip_stream(chunks):
+    """
+    Compress an iterator of byte chunks, yielding compressed chunks as the buffer fills so the
+    full uncompressed serialization never has to exist in memory at once.
+    """
+    buf = StringIO()
+    gz = gzip.GzipFile(fileobj=buf, mode='wb', compresslevel=6)
+    for chunk in chunks:
+        gz.write(chunk)
+        if buf.tell() >= 65536:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    gz.close()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+# Retry transient failures (connection resets, 5xx, throttling) with exponential backoff inside a
+# single upload call, rather than immediately spilling the report to disk and deferring to the
+# watcher. Unrecoverable errors (eg. 4xx responses) are not retried and still return False.
+_retries = Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                 method_whitelist=frozenset(['POST']))
+
 
-def upload_report(server, payload, timeout=HQ_DEFAULT_TIMEOUT):
+def _create_session():
+    """
+    Create a requests Session that pools and reuses keep-alive connections to the server, so that
+    repeat uploads (eg. the offline report watcher) do not pay for a new TCP + TLS handshake per call.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=10, max_retries=_retries)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+_session = _create_session()
+
+
+def set_session(session):
+    """
+    Inject a pre-configured requests.Session to be used for all uploads.
+    :param session: requests.Session instance
+    """
+    global _session
+    _session = session
+
+
+def upload_report(server, payload, timeout=HQ_DEFAULT_TIMEOUT, compress=True):
     """
     Upload a report to the server.
     :param payload: Dictionary (JSON serializable) of crash data.
+    :param compress: gzip the request body. Crash payloads are highly compressible text; disable
+                     only for servers that cannot decode Content-Encoding: gzip.
     :return: server response
     """
     try:
-        data = json.dumps(payload)
-        r = requests.post(server + '/reports/upload', data=data, timeout=timeout)
+        data = _encode(payload)
+        headers = {'Content-Type': 'application/json; charset=utf-8'}
+        if compress:
+            data = _gzip_bytes(data)
+            headers['Content-Encoding'] = 'gzip'
+        r = _session.post(server + '/reports/upload', data=data, headers=headers, timeout=timeout)
     except Exception as e:
         logging.error(e)
         return False
     return r
 
 
-def upload_many_reports(server, payloads, timeout=HQ_DEFAULT_TIMEOUT):
+def _iter_json(payload):
+    """
+    Incrementally serialize `payload` to UTF-8 encoded JSON chunks. Serializing piece-wise avoids
+    holding both the payload and its entire serialized form in memory at once, and lets the upload
+    start streaming (chunked transfer) before serialization has finished.
+    """
+    for chunk in _encoder.iterencode(payload):
+        if isinstance(chunk, unicode):
+            chunk = chunk.encode('utf-8')
+        yield chunk
+
+
+def upload_many_reports(server, payloads, timeout=HQ_DEFAULT_TIMEOUT, compress=True):
 
     try:
-        data = json.dumps(payloads)
-        r = requests.post(server + '/reports/upload_many', data=data, timeout=timeout)
+        headers = {'Content-Type': 'application/json; charset=utf-8'}
+        chunks = _iter_json(payloads)
+        if compress:
+            chunks = _gzip_stream(chunks)
+            headers['Content-Encoding'] = 'gzip'
+        # The session's retry policy can only replay a body it can re-read, and a consumed
+        # generator cannot be rewound, so the (compressed) chunks are buffered into a single
+        # string before posting. Serialization and compression still run incrementally, so peak
+        # memory is bounded by the compressed batch rather than payload + serialized form.
+        data = ''.join(chunks)
+        r = _session.post(server + '/reports/upload_many', data=data,
+                          headers=headers, timeout=timeout)
     except Exception as e:
         logging.error(e)
         return False
@@ -42,7 +155,7 @@ def delete_report(server, report_number, timeout=HQ_DEFAULT_TIMEOUT):
     :return: server response
     """
     try:
-        r = requests.post(server + "/reports/delete/%d" % report_number, timeout=timeout)
+        r = _session.post(server + "/reports/delete/%d" % report_number, timeout=timeout)
     except Exception as e:
         logging.error(e)
         return False
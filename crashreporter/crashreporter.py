@@ -1,28 +1,37 @@
 __author__ = 'calvin'
 
-import ConfigParser
+import atexit
+import copy
 import datetime
-import glob
-import json
 import logging
 import os
+import Queue
 import re
-import shutil
-import smtplib
 import sys
+import tempfile
 import time
-from email import encoders
-from email.mime.base import MIMEBase
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from threading import Thread
+from threading import Thread, Lock, RLock, Timer
 
-import jinja2
+try:
+    # ujson implements load/dump in C and is several times faster on the offline-report hot paths
+    import ujson as json
+except ImportError:
+    import json
 
 from api import upload_report, upload_many_reports, HQ_DEFAULT_TIMEOUT, SMTP_DEFAULT_TIMEOUT
-from process import CrashReportingProcess
+from process import CrashReportingProcess, recv_payload
 from tools import analyze_traceback, repr as safe_repr
 
+# Matches the trailing report number in an offline report filename
+_report_number_regex = re.compile(r'(\d+)(?!.*\d)')
+
+_DATE_FMT = '%d %B %Y'
+_TIME_FMT = '%I:%M %p'
+
+# Parsed configuration files keyed by (path, mtime), so applications that create several
+# CrashReporter instances (eg. one per worker process) only pay for the INI parse once
+_config_cache = {}
+
 
 class CrashReporter(object):
     """
@@ -32,8 +41,8 @@ class CrashReporter(object):
     If a crash report fails to upload, the report is saved locally to the `report_dir` directory. The next time the
     CrashReporter starts up, it will attempt to upload all offline reports every `check_interval` seconds. After a
     successful upload the offline reports are deleted. A maximum of `offline_report_limit` reports are saved at any
-    time. Reports are named crashreport01, crashreport02, crashreport03 and so on. The most recent report is always
-    crashreport01.
+    time. Reports are named crash_report_<timestamp>, where the timestamp is the save time in milliseconds, so the
+    most recent report always sorts last.
 
     Report Customizing Attributes:
 
@@ -64,18 +73,35 @@ class CrashReporter(object):
     offline_report_limit = 10
     recursion_depth_limit = 10
     send_at_most = 3            # max number of offline reports to send in batch
+    smtp_max_messages = 100     # messages to send over one SMTP connection before reconnecting
     max_string_length = 1000
-    obj_ref_regex = re.compile("[A-z]+[0-9]*\.(?:[A-z]+[0-9]*\.?)+(?!\')")
+    _template = None
+    _template_lock = Lock()
+    obj_ref_regex = re.compile(r"[A-Za-z_]\w*(?:\.[A-Za-z_]\w*)+(?!')")
 
     def __init__(self, report_dir=None, config='', logger=None, activate=True,
                  watcher=True, check_interval=5*60):
         self.logger = logger if logger else logging.getLogger('CrashReporter')
-        # Setup the directory used to store offline crash reports
+        # Setup the directory used to store offline crash reports. The report path template and
+        # filename prefix are computed once here so the store/list hot paths don't rebuild them.
         self.report_dir = report_dir
+        self._report_path_fmt = os.path.join(report_dir, self._report_name) if report_dir else None
+        self._report_prefix = self._report_name.split('%d', 1)[0]
         self.check_interval = check_interval
         self.watcher_enabled = watcher
-        self._watcher = None
+        self._watcher_timer = None
         self._watcher_running = False
+        self._watcher_interval = check_interval
+        self._watcher_failed_ticks = 0
+        # Guards the armed/stopped state shared between ticks and the store path's restarts
+        self._watcher_lock = Lock()
+        self._offline_cache = None
+        self._offline_cache_mtime = 0
+        self._store_queue = Queue.Queue(maxsize=self.offline_report_limit * 2)
+        self._store_thread = None
+        self._store_lock = Lock()
+        self._send_queue = Queue.Queue()
+        self._send_thread = None
         self.etype = None
         self.evalue = None
         self.tb = None
@@ -85,7 +111,15 @@ class CrashReporter(object):
         self._excepthook = None
         self.inspection_level = 1
         self._smtp = None
+        self._smtp_conn = None
+        self._smtp_sent_count = 0
+        self._smtp_to_header = None
+        # Serializes all use of the pooled connection: the send worker, the watcher timer and
+        # the main thread can each reach the SMTP paths at the same time
+        self._smtp_lock = RLock()
         self._hq = None
+        # Make sure pooled connections are released when the interpreter exits
+        atexit.register(self.close)
         # Load the configuration from a file if specified
         if os.path.isfile(config):
             self.load_configuration(config)
@@ -110,6 +144,7 @@ class CrashReporter(object):
             logging.error(e)
             self._smtp['timeout'] = None
         self._smtp['from'] = kwargs.get('from', user)
+        self._smtp_to_header = None
 
     def setup_hq(self, server, **kwargs):
         self._hq = kwargs
@@ -150,28 +185,41 @@ class CrashReporter(object):
             # Restore the original excepthook
             sys.excepthook = self._excepthook
             self.stop_watcher()
+            self.close()
             self.logger.info('CrashReporter: Disabled')
 
     def start_watcher(self):
         """
         Start the watcher that periodically checks for offline reports and attempts to upload them.
         """
-        if self._watcher and self._watcher.is_alive:
+        with self._watcher_lock:
             self._watcher_running = True
-        else:
-            self.logger.info('CrashReporter: Starting watcher.')
-            self._watcher = Thread(target=self._watcher_thread, name='offline_reporter')
-            self._watcher.setDaemon(True)
-            self._watcher_running = True
-            self._watcher.start()
+            if self._watcher_timer is None:
+                self.logger.info('CrashReporter: Starting watcher.')
+                self._watcher_interval = self.check_interval
+                self._arm_watcher()
+
+    def _arm_watcher(self):
+        """
+        Schedule the next watcher tick. A one-shot Timer re-armed after each tick replaces the
+        long-lived sleeping thread, so no thread exists between ticks. The caller must hold
+        _watcher_lock.
+        """
+        self._watcher_timer = Timer(self._watcher_interval, self._watcher_tick)
+        self._watcher_timer.setDaemon(True)
+        self._watcher_timer.start()
 
     def stop_watcher(self):
         """
         Stop the watcher thread that tries to send offline reports.
         """
-        if self._watcher:
-            self._watcher_running = False
-            self.logger.info('CrashReporter: Stopping watcher.')
+        with self._watcher_lock:
+            if self._watcher_timer is not None:
+                self._watcher_running = False
+                # Cancelling the pending timer stops the watcher immediately
+                self._watcher_timer.cancel()
+                self._watcher_timer = None
+                self.logger.info('CrashReporter: Stopping watcher.')
 
     def interprocess_exception_handler(self, err_name, err_msg, analyzed_tb):
         payload = self.generate_payload(err_name, err_msg, analyzed_tb)
@@ -217,8 +265,13 @@ class CrashReporter(object):
 
         if etype:
             self.logger.info('CrashReporter: Crashes detected!')
+            # The traceback must be analyzed synchronously since its frames die with the hook,
+            # but the resulting payload is only JSON-compatible data and can be sent off-thread.
             self.analyzed_traceback = self._analyze_traceback(tb)
-            self.handle_payload(self.generate_payload(etype.__name__, '%s' % evalue, self.analyzed_traceback))
+            self._enqueue_payload(self.generate_payload(etype.__name__, '%s' % evalue, self.analyzed_traceback))
+            # Give the sender a bounded window to deliver before the exception is forwarded and
+            # the process potentially goes down
+            self._drain_send_queue(self._submission_timeout())
         else:
             self.logger.info('CrashReporter: No crashes detected.')
 
@@ -235,6 +288,40 @@ class CrashReporter(object):
         """
         self._excepthook(etype, evalue, tb)
 
+    def _send_worker(self):
+        while 1:
+            payload = self._send_queue.get()
+            try:
+                self.handle_payload(payload)
+            except Exception as e:
+                self.logger.error('CrashReporter: %s' % e)
+            finally:
+                self._send_queue.task_done()
+
+    def _enqueue_payload(self, payload):
+        """
+        Queue a payload for submission by the background sender, so the excepthook itself performs
+        no network I/O.
+        """
+        if self._send_thread is None or not self._send_thread.is_alive():
+            self._send_thread = Thread(target=self._send_worker, name='crashreporter_send')
+            self._send_thread.setDaemon(True)
+            self._send_thread.start()
+        self._send_queue.put(payload)
+
+    def _submission_timeout(self):
+        total = 0
+        if self._hq is not None:
+            total += self._hq['timeout'] or HQ_DEFAULT_TIMEOUT
+        if self._smtp is not None:
+            total += self._smtp['timeout'] or SMTP_DEFAULT_TIMEOUT
+        return total or HQ_DEFAULT_TIMEOUT
+
+    def _drain_send_queue(self, timeout):
+        deadline = time.time() + timeout
+        while self._send_queue.unfinished_tasks and time.time() < deadline:
+            time.sleep(0.05)
+
     def handle_payload(self, payload):
         """
         Given a crash report (JSON represented payload), attempts to upload the crash reports. Calls the default
@@ -244,22 +331,43 @@ class CrashReporter(object):
         """
         self.payload = payload
         if CrashReporter.active:
-            # Attempt to upload the report
+            # Attempt to upload the report. The HQ and SMTP submissions run concurrently in worker
+            # threads so the total wait is bounded by the slower of the two, not their sum.
             hq_success = smtp_success = False
+            results = {}
+
+            def _submit(key, func, *args):
+                results[key] = func(*args)
+
+            threads = []
+            total_timeout = 0
             if self._hq is not None:
-                hq_success = self.hq_submit(self.payload)
-                if hq_success:
-                    self.payload['HQ Submission'] = 'Sent'
+                threads.append(Thread(target=_submit, args=('hq', self.hq_submit, self.payload),
+                                      name='hq_submit'))
+                total_timeout += self._hq['timeout'] or HQ_DEFAULT_TIMEOUT
             if self._smtp is not None:
                 # Send the report via email
-                smtp_success = self.smtp_submit(self.subject(), self.body(self.payload), self.attachments())
-                if smtp_success:
-                    self.payload['SMTP Submission'] = 'Sent'
+                threads.append(Thread(target=_submit,
+                                      args=('smtp', self.smtp_submit, self.subject(),
+                                            self.body(self.payload), self.attachments()),
+                                      name='smtp_submit'))
+                total_timeout += self._smtp['timeout'] or SMTP_DEFAULT_TIMEOUT
+            for t in threads:
+                t.setDaemon(True)
+                t.start()
+            deadline = time.time() + total_timeout
+            for t in threads:
+                t.join(max(0, deadline - time.time()))
+            hq_success = results.get('hq', False)
+            smtp_success = results.get('smtp', False)
+            if hq_success:
+                self.payload['HQ Submission'] = 'Sent'
+            if smtp_success:
+                self.payload['SMTP Submission'] = 'Sent'
 
         if not CrashReporter.active or (self._smtp and not smtp_success) or (self._hq and not hq_success):
             # Only store the offline report if any of the upload methods fail, or if the Crash Reporter was disabled
-            report_path = self.store_report(self.payload)
-            self.logger.info('Offline Report stored %s' % report_path)
+            self.store_report_async(self.payload)
 
     def generate_payload(self, err_name, err_msg, analyzed_tb):
         dt = datetime.datetime.now()
@@ -268,8 +376,8 @@ class CrashReporter(object):
                    'Application Name': self.application_name,
                    'Application Version': self.application_version,
                    'User': self.user_identifier,
-                   'Date': dt.strftime('%d %B %Y'),
-                   'Time': dt.strftime('%I:%M %p'),
+                   'Date': dt.strftime(_DATE_FMT),
+                   'Time': dt.strftime(_TIME_FMT),
                    'Traceback': analyzed_tb,
                    'HQ Submission': 'Not sent' if self._hq else 'Disabled',
                    'SMTP Submission': 'Not sent' if self._smtp else 'Disabled'
@@ -277,26 +385,40 @@ class CrashReporter(object):
         return payload
 
     def load_configuration(self, config):
-        cfg = ConfigParser.ConfigParser()
-
-        with open(config, 'r') as _f:
-            cfg.readfp(_f)
-            if cfg.has_section('General'):
-                general = dict(cfg.items('General'))
-                self.application_name = general.get('application_name', CrashReporter.application_name)
-                self.application_version = general.get('application_version', CrashReporter.application_version)
-                self.user_identifier = general.get('user_identifier', CrashReporter.user_identifier)
-                self.offline_report_limit = general.get('offline_report_limit', CrashReporter.offline_report_limit)
-                self.max_string_length = general.get('max_string_length', CrashReporter.max_string_length)
-            if cfg.has_section('SMTP'):
-                self.setup_smtp(**dict(cfg.items('SMTP')))
-                if 'port' in self._smtp:
-                    self._smtp['port'] = int(self._smtp['port'])
-                if 'recipients' in self._smtp:
-                    self._smtp['recipients'] = self._smtp['recipients'].split(',')
-
-            if cfg.has_section('HQ'):
-                self.setup_hq(**dict(cfg.items('HQ')))
+        key = (config, os.stat(config).st_mtime)
+        cached = _config_cache.get(key)
+        if cached is not None:
+            # Hand out a deep copy so per-instance fixups can never leak back into the cache
+            sections = copy.deepcopy(cached)
+        else:
+            import ConfigParser
+            cfg = ConfigParser.ConfigParser()
+            with open(config, 'r') as _f:
+                cfg.readfp(_f)
+            sections = {}
+            for section in ('General', 'SMTP', 'HQ'):
+                if cfg.has_section(section):
+                    sections[section] = dict(cfg.items(section))
+            _config_cache[key] = copy.deepcopy(sections)
+
+        general = sections.get('General')
+        if general is not None:
+            self.application_name = general.get('application_name', CrashReporter.application_name)
+            self.application_version = general.get('application_version', CrashReporter.application_version)
+            self.user_identifier = general.get('user_identifier', CrashReporter.user_identifier)
+            # ConfigParser hands back strings; coerce the numeric options so arithmetic against
+            # them (eg. the eviction count in store_report) doesn't raise
+            self.offline_report_limit = int(general.get('offline_report_limit', CrashReporter.offline_report_limit))
+            self.max_string_length = int(general.get('max_string_length', CrashReporter.max_string_length))
+        if 'SMTP' in sections:
+            self.setup_smtp(**sections['SMTP'])
+            if 'port' in self._smtp:
+                self._smtp['port'] = int(self._smtp['port'])
+            if 'recipients' in self._smtp:
+                self._smtp['recipients'] = self._smtp['recipients'].split(',')
+
+        if 'HQ' in sections:
+            self.setup_hq(**sections['HQ'])
 
     def subject(self):
         """
@@ -311,12 +433,24 @@ class CrashReporter(object):
     def body(self, payload):
         return self.render_report(payload, inspection_level=self.inspection_level)
 
-    def render_report(self, payload, inspection_level=1):
-        with open(self.html_template, 'r') as _f:
-            template = jinja2.Template(_f.read())
+    @classmethod
+    def _get_template(cls):
+        """
+        Lazily compile and cache the report template. The template file never changes at runtime so
+        there is no need to re-read and re-parse it for every report that gets rendered.
+        """
+        if cls._template is None:
+            with cls._template_lock:
+                if cls._template is None:
+                    import jinja2
+                    env = jinja2.Environment(loader=jinja2.FileSystemLoader(os.path.dirname(cls.html_template)),
+                                             auto_reload=False)
+                    cls._template = env.get_template(os.path.basename(cls.html_template))
+        return cls._template
 
-        return template.render(info=payload,
-                               inspection_level=inspection_level)
+    def render_report(self, payload, inspection_level=1):
+        return self._get_template().render(info=payload,
+                                           inspection_level=inspection_level)
 
     def attachments(self):
         """
@@ -330,24 +464,25 @@ class CrashReporter(object):
         Delete all stored offline reports
         :return: List of reports that still require submission
         """
-        reports = self.get_offline_reports()
-        remaining_reports = reports[:]
-        for report in reports:
+        remaining_reports = []
+        for report in self.get_offline_reports():
             with open(report, 'r') as _f:
                 try:
                     js = json.load(_f)
                 except ValueError as e:
-                    logging.error("%s. Deleting crash report.")
+                    logging.error("%s. Deleting crash report." % e)
                     os.remove(report)
                     continue
-                if js['SMTP Submission'] in ('Sent', 'Disabled') and js['HQ Submission'] in ('Sent', 'Disabled'):
-                    # Only delete the reports which have been sent or who's upload method is disabled.
-                    remaining_reports.remove(report)
-                    try:
-                        os.remove(report)
-                    except OSError as e:
-                        logging.error(e)
+            if js['SMTP Submission'] in ('Sent', 'Disabled') and js['HQ Submission'] in ('Sent', 'Disabled'):
+                # Only delete the reports which have been sent or who's upload method is disabled.
+                try:
+                    os.remove(report)
+                except OSError as e:
+                    logging.error(e)
+            else:
+                remaining_reports.append(report)
 
+        self._invalidate_offline_cache()
         self.logger.info('CrashReporter: Deleting offline reports. %d reports remaining.' % len(remaining_reports))
         return remaining_reports
 
@@ -386,28 +521,83 @@ class CrashReporter(object):
         logging.info('%d crash reports remain to be submitted' % len(remaining_reports))
         return all(success)
 
+    def _store_worker(self):
+        while 1:
+            payload = self._store_queue.get()
+            try:
+                with self._store_lock:
+                    report_path = self.store_report(payload)
+                self._report_stored(report_path)
+            except Exception as e:
+                self.logger.error('CrashReporter: %s' % e)
+            finally:
+                self._store_queue.task_done()
+
+    def store_report_async(self, payload):
+        """
+        Queue a crash report to be written to disk by the background writer, so the crash path does
+        not block on the report rotation and write. Falls back to a synchronous write when the
+        queue is full.
+        """
+        if self._store_thread is None or not self._store_thread.is_alive():
+            self._store_thread = Thread(target=self._store_worker, name='crashreporter_store')
+            self._store_thread.setDaemon(True)
+            self._store_thread.start()
+        try:
+            # The payload is copied so later mutations (eg. submission flags) cannot race the write
+            self._store_queue.put_nowait(copy.deepcopy(payload))
+        except Queue.Full:
+            with self._store_lock:
+                report_path = self.store_report(payload)
+            self._report_stored(report_path)
+
+    def _report_stored(self, report_path):
+        self.logger.info('Offline Report stored %s' % report_path)
+        # Push-style wake: a newly stored report (re)starts the watcher, instead of a watcher
+        # polling on a fixed schedule regardless of whether anything is waiting. Combined with
+        # the watcher stopping itself once the directory is empty, ticks only ever run while
+        # there is actually something to send.
+        if self.watcher_enabled and CrashReporter.active:
+            self.start_watcher()
+
+    def _drain_store_queue(self, timeout=5):
+        deadline = time.time() + timeout
+        while self._store_queue.unfinished_tasks and time.time() < deadline:
+            time.sleep(0.05)
+
     def store_report(self, payload):
         """
-        Save the crash report to a file. Keeping the last `offline_report_limit` files in a cyclical FIFO buffer.
-        The newest crash report always named is 01
+        Save the crash report to a file. Keeping the last `offline_report_limit` files, oldest deleted first.
+        The report name carries a millisecond timestamp so the newest report always sorts last.
         """
         offline_reports = self.get_offline_reports()
-        if offline_reports:
-            # Increment the name of all existing reports 1 --> 2, 2 --> 3 etc.
-            for ii, report in enumerate(reversed(offline_reports)):
-                rpath, ext = os.path.splitext(report)
-                n = int(re.findall('(\d+)', rpath)[-1])
-                new_name = os.path.join(self.report_dir, self._report_name % (n + 1)) + ext
-                shutil.copy2(report, new_name)
-            os.remove(report)
-            # Delete the oldest report
-            if len(offline_reports) >= self.offline_report_limit:
-                oldest = glob.glob(os.path.join(self.report_dir, self._report_name % (self.offline_report_limit+1) + '*'))[0]
-                os.remove(oldest)
-        new_report_path = os.path.join(self.report_dir, self._report_name % 1 + '.json')
-        # Write a new report
-        with open(new_report_path, 'w') as _f:
-            json.dump(payload, _f)
+        # Timestamped names keep the listing in age order on their own, so making room is a
+        # matter of deleting the oldest file(s) instead of renaming the entire directory.
+        excess = len(offline_reports) - self.offline_report_limit + 1
+        if excess > 0:
+            for report in offline_reports[:excess]:
+                try:
+                    os.remove(report)
+                except OSError as e:
+                    logging.error(e)
+        # Several crashes can be stored in the same millisecond (eg. the store worker draining
+        # its queue back-to-back), so bump the timestamp until the name is unused rather than
+        # letting the rename below overwrite an earlier report.
+        ts = int(time.time() * 1000)
+        new_report_path = self._report_path_fmt % ts + '.json'
+        while os.path.exists(new_report_path):
+            ts += 1
+            new_report_path = self._report_path_fmt % ts + '.json'
+        # Write the report to a temporary file and rename it into place, so that a crash mid-write
+        # can never leave a partial (unparseable) report as the only record of the crash.
+        tf = tempfile.NamedTemporaryFile(mode='w', dir=self.report_dir, delete=False)
+        try:
+            json.dump(payload, tf)
+            tf.flush()
+        finally:
+            tf.close()
+        os.rename(tf.name, new_report_path)
+        self._invalidate_offline_cache()
 
         return new_report_path
 
@@ -419,15 +609,110 @@ class CrashReporter(object):
         else:
             return r.status_code == 200
 
-    def smtp_submit(self, subject, body, attachments=None):
+    def _smtp_open(self):
+        """
+        Open, handshake and log in to a new SMTP connection.
+        :return: smtplib.SMTP connection
+        """
+        import smtplib
+        smtp = self._smtp
+        ms = smtplib.SMTP(smtp['host'], smtp['port'], timeout=smtp['timeout'])
+        ms.ehlo()
+        # Only pay for the TLS upgrade round-trip when the server actually advertises it
+        if ms.has_extn('starttls'):
+            ms.starttls()
+            ms.ehlo()
+        ms.login(smtp['user'], smtp['passwd'])
+        return ms
+
+    def _smtp_close(self, ms):
+        try:
+            ms.close()
+        except Exception as e:
+            self.logger.error('CrashReporter: %s' % e)
+
+    def _smtp_connect(self):
+        """
+        Return a live, logged-in SMTP connection, reusing the pooled one when the server still
+        considers it open. Reconnecting only on a failed liveness probe saves the full
+        connect / starttls / login handshake on every send after the first.
+        """
+        with self._smtp_lock:
+            if self._smtp_conn is not None and self._smtp_sent_count >= self.smtp_max_messages:
+                # Many servers cap the number of messages per session; rotate proactively rather
+                # than waiting for the server to drop us mid-send
+                self._smtp_disconnect()
+            if self._smtp_conn is not None:
+                try:
+                    if self._smtp_conn.noop()[0] == 250:
+                        return self._smtp_conn
+                except Exception:
+                    pass
+                self._smtp_conn = None
+            self._smtp_conn = self._smtp_open()
+            self._smtp_sent_count = 0
+            return self._smtp_conn
+
+    def _smtp_disconnect(self):
+        with self._smtp_lock:
+            if self._smtp_conn is not None:
+                self._smtp_close(self._smtp_conn)
+                self._smtp_conn = None
+                self._smtp_sent_count = 0
+
+    def _smtp_send(self, send):
+        """
+        Run `send` against the pooled connection while holding the SMTP lock, reconnecting and
+        retrying once if the server dropped the pooled connection mid-send.
+        """
+        import smtplib
+        with self._smtp_lock:
+            ms = self._smtp_connect()
+            try:
+                send(ms)
+            except smtplib.SMTPServerDisconnected:
+                self._smtp_disconnect()
+                ms = self._smtp_connect()
+                send(ms)
+
+    def close(self):
+        """
+        Flush any queued offline reports and release any pooled network connections held by the
+        crash reporter.
+        """
+        self._drain_send_queue(self._submission_timeout())
+        self._drain_store_queue()
+        self._smtp_disconnect()
+
+    def _new_message(self, subject):
+        """
+        Build a message envelope with the To/From/Subject headers set. The joined recipient
+        header is computed once and cached since it never changes between reports.
+        """
+        from email.mime.multipart import MIMEMultipart
+
         smtp = self._smtp
+        if self._smtp_to_header is None:
+            if isinstance(smtp['recipients'], list) or isinstance(smtp['recipients'], tuple):
+                self._smtp_to_header = ', '.join(smtp['recipients'])
+            else:
+                self._smtp_to_header = smtp['recipients']
         msg = MIMEMultipart()
-        if isinstance(smtp['recipients'], list) or isinstance(smtp['recipients'], tuple):
-            msg['To'] = ', '.join(smtp['recipients'])
-        else:
-            msg['To'] = smtp['recipients']
+        msg['To'] = self._smtp_to_header
         msg['From'] = smtp['from']
         msg['Subject'] = subject
+        return msg
+
+    def _smtp_send_one(self, ms, subject, body, attachments=None):
+        """
+        Build and send a single report email over an already-open SMTP connection.
+        """
+        from email import encoders
+        from email.mime.base import MIMEBase
+        from email.mime.text import MIMEText
+
+        smtp = self._smtp
+        msg = self._new_message(subject)
 
         # Add the body of the message
         msg.attach(MIMEText(body, 'html'))
@@ -436,71 +721,153 @@ class CrashReporter(object):
         if attachments:
             for attachment in attachments:
                 part = MIMEBase('application', 'octet-stream')
-                part.set_payload(open(attachments, 'rb').read())
+                with open(attachment, 'rb') as _f:
+                    part.set_payload(_f.read())
                 encoders.encode_base64(part)
                 part.add_header('Content-Disposition',
                                 'attachment; filename="%s"' % os.path.basename(attachment))
                 msg.attach(part)
 
+        ms.sendmail(smtp['from'], smtp['recipients'], msg.as_string())
+        self._smtp_sent_count += 1
+
+    def smtp_submit(self, subject, body, attachments=None):
         try:
-            ms = smtplib.SMTP(smtp['host'], smtp['port'], timeout=smtp['timeout'])
-            ms.ehlo()
-            ms.starttls()
-            ms.ehlo()
-            ms.login(smtp['user'], smtp['passwd'])
-            ms.sendmail(smtp['from'], smtp['recipients'], msg.as_string())
-            ms.close()
+            self._smtp_send(lambda ms: self._smtp_send_one(ms, subject, body, attachments))
         except Exception as e:
             self.logger.error('CrashReporter: %s' % e)
             return False
 
         return True
 
+    def _invalidate_offline_cache(self):
+        self._offline_cache = None
+
     def get_offline_reports(self):
-        return sorted(glob.glob(os.path.join(self.report_dir, self._report_name.replace("%d", "*"))))
+        # The listing is cached against the directory's mtime so repeated calls in the same
+        # operation (and watcher ticks with nothing new) cost a single stat instead of a scan.
+        # Mutating operations also invalidate the cache explicitly since directory mtime
+        # resolution can be as coarse as one second.
+        try:
+            mtime = os.stat(self.report_dir).st_mtime
+        except OSError:
+            return []
+        if self._offline_cache is not None and mtime == self._offline_cache_mtime:
+            return self._offline_cache
+        # A prefix check over the directory listing is cheaper than glob's fnmatch pass, and
+        # sorting on the numeric suffix keeps report 10 ordered after report 2.
+        prefix = self._report_prefix
+        reports = [os.path.join(self.report_dir, name) for name in os.listdir(self.report_dir)
+                   if name.startswith(prefix)]
+        reports.sort(key=lambda p: int(_report_number_regex.search(p).group(1)))
+        self._offline_cache = reports
+        self._offline_cache_mtime = mtime
+        return reports
 
     def poll(self):
         for remote, local in CrashReportingProcess.cr_pipes:
             if remote.poll():
-                pkg = remote.recv()
+                pkg = recv_payload(remote)
                 self.logger.debug('Interprocess payload found.')
                 self.handle_payload(self.generate_payload(*pkg))
                 return True
         return False
 
-    def _watcher_thread(self):
+    def _watcher_tick(self):
         """
         Periodically attempt to upload the crash reports. If any upload method is successful, delete the saved reports.
         """
-        while 1:
-            time.sleep(self.check_interval)
+        with self._watcher_lock:
             if not self._watcher_running:
-                break
+                self._watcher_timer = None
+                self.logger.info('CrashReporter: Watcher stopped.')
+                return
+        # Log the attempt on the first tick and once every 10 consecutive failures rather than on
+        # every cycle, so a perpetually unreachable server does not generate steady log volume.
+        if self._watcher_failed_ticks % 10 == 0 and self.logger.isEnabledFor(logging.INFO):
             self.logger.info('CrashReporter: Attempting to send offline reports.')
-            self.submit_offline_reports()
-            remaining_reports = len(self.get_offline_reports())
-            if remaining_reports == 0:
-                break
-        self._watcher = None
-        self.logger.info('CrashReporter: Watcher stopped.')
+        success = self.submit_offline_reports()
+        # The stop-vs-rearm decision shares _watcher_lock with start_watcher: a report stored
+        # while the submission above ran either still sees the timer armed (and is covered by the
+        # listing re-checked here, since its file was written before _report_stored fired), or
+        # finds the timer cleared and restarts the watcher itself.
+        with self._watcher_lock:
+            if not self._watcher_running or not self.get_offline_reports():
+                self._watcher_timer = None
+                self.logger.info('CrashReporter: Watcher stopped.')
+                return
+            if success:
+                self._watcher_interval = self.check_interval
+                self._watcher_failed_ticks = 0
+            else:
+                self._watcher_failed_ticks += 1
+                # Back off while the server stays unreachable so a dead endpoint is not hammered
+                # at the full rate forever; one success resets the interval.
+                self._watcher_interval = min(self._watcher_interval * 2, self.check_interval * 16)
+            self._arm_watcher()
 
     def _smtp_send_offline_reports(self, *offline_reports):
         success = []
         if offline_reports:
-            # Add the body of the message
+            pending = []
             for report in offline_reports:
                 with open(report, 'r') as js:
                     payload = json.load(js)
                 if payload['SMTP Submission'] == 'Not sent':
-                    success.append(self.smtp_submit(self.subject(), self.body(payload)))
-                    if success[-1]:
-                        # Set the flag in the payload signifying that the SMTP submission was successful
-                        payload['SMTP Submission'] = 'Sent'
-                        with open(report, 'w') as js:
-                            json.dump(payload, js)
+                    pending.append((report, payload))
+            if not pending:
+                return success
+
+            # The subject only depends on the application name/version, so build it once for
+            # the whole batch.
+            subject = self.subject()
+            if len(pending) == 1:
+                success = [self.smtp_submit(subject, self.body(pending[0][1]))]
+            else:
+                # Send the whole batch as one multi-part message: a single SMTP transaction
+                # instead of one message per report.
+                sent = self._smtp_submit_batch(subject, pending)
+                success = [sent] * len(pending)
+
+            for (report, payload), sent in zip(pending, success):
+                if sent:
+                    # Set the flag in the payload signifying that the SMTP submission was successful
+                    payload['SMTP Submission'] = 'Sent'
+                    with open(report, 'w') as js:
+                        json.dump(payload, js)
+            # The pooled connection is left open for reuse by later sends
             self.logger.info('CrashReporter: %d Offline reports sent.' % sum(success))
         return success
 
+    def _smtp_submit_batch(self, subject, pending):
+        """
+        Send several offline reports as one multi-part message. Each report is attached as its
+        own rendered HTML part so recipients view them independently, while the whole batch
+        costs one SMTP transaction and one message's worth of protocol overhead.
+        """
+        from email.mime.text import MIMEText
+
+        smtp = self._smtp
+        msg = self._new_message(subject)
+        msg.attach(MIMEText('%d offline crash reports are attached.' % len(pending), 'plain'))
+        for report, payload in pending:
+            part = MIMEText(self.body(payload), 'html')
+            part.add_header('Content-Disposition', 'attachment; filename="%s.html"'
+                            % os.path.splitext(os.path.basename(report))[0])
+            msg.attach(part)
+
+        def send(ms):
+            ms.sendmail(smtp['from'], smtp['recipients'], msg.as_string())
+            self._smtp_sent_count += 1
+
+        try:
+            self._smtp_send(send)
+        except Exception as e:
+            self.logger.error('CrashReporter: %s' % e)
+            return False
+
+        return True
+
     def _hq_send_offline_reports(self, *offline_reports):
         payloads = {}
         if offline_reports:
@@ -517,11 +884,21 @@ class CrashReporter(object):
                 if r is False or r.status_code != 200:
                     return [False] * len(payloads)
 
-            # Set the flag in the payload signifying that the HQ submission was successful
+            # Set the flag in the payload signifying that the HQ submission was successful. When
+            # the report has no SMTP submission still pending there is nothing left to send, so
+            # remove the file directly rather than rewriting it only for delete_offline_reports
+            # to reopen and delete it moments later.
             for report, payload in payloads.iteritems():
-                payload['HQ Submission'] = 'Sent'
-                with open(report, 'w') as js:
-                    json.dump(payload, js)
+                if payload['SMTP Submission'] == 'Not sent':
+                    payload['HQ Submission'] = 'Sent'
+                    with open(report, 'w') as js:
+                        json.dump(payload, js)
+                else:
+                    try:
+                        os.remove(report)
+                    except OSError as e:
+                        logging.error(e)
+            self._invalidate_offline_cache()
 
             return [True] * len(payloads)
         else:
@@ -1,3 +1,4 @@
+import atexit
 import logging
 import multiprocessing
 import sys
@@ -5,9 +6,31 @@ import traceback
 
 from .tools import analyze_traceback
 
+try:
+    # msgpack packs the analyzed traceback several times smaller and faster than pickle, which
+    # matters on the crashed process's final pipe write
+    import msgpack
+    _MSGPACK_INSTALLED = True
+except ImportError:
+    _MSGPACK_INSTALLED = False
+
 mp_crash_reporting_enabled = False
 
 
+def send_payload(conn, payload):
+    if _MSGPACK_INSTALLED:
+        conn.send_bytes(msgpack.packb(payload, use_bin_type=True))
+    else:
+        conn.send(payload)
+
+
+def recv_payload(conn):
+    if _MSGPACK_INSTALLED:
+        return msgpack.unpackb(conn.recv_bytes(), raw=False)
+    else:
+        return conn.recv()
+
+
 def enable_mp_crash_reporting():
     """
     Monkey-patch the multiprocessing.Process class with our own CrashReportingProcess.
@@ -37,6 +60,30 @@ class CrashReportingProcess(multiprocessing.Process):
         self.cr_remote_conn, self.cr_local_conn = multiprocessing.Pipe(duplex=False)
         CrashReportingProcess.cr_pipes.append((self.cr_remote_conn, self.cr_local_conn))
 
+    def join(self, timeout=None):
+        super(CrashReportingProcess, self).join(timeout)
+        # Retire this process's pipe pair once it has exited and nothing is left to poll, so
+        # cr_pipes (and the main-process poll loop) stay bounded by the number of live processes
+        # instead of growing with every process ever spawned. A pipe still holding an unread
+        # crash report is kept until poll() drains it.
+        if not self.is_alive() and not self.cr_remote_conn.poll():
+            self.cr_close_pipes()
+
+    def cr_close_pipes(self):
+        """
+        Close and unregister this process's crash-reporting pipe pair.
+        """
+        pair = (self.cr_remote_conn, self.cr_local_conn)
+        try:
+            CrashReportingProcess.cr_pipes.remove(pair)
+        except ValueError:
+            return
+        for conn in pair:
+            try:
+                conn.close()
+            except Exception as e:
+                logging.error(e)
+
     def exception_handler(self, e):
         logging.debug('CrashReporter: Crash detected on process {}'.format(self.name))
         etype, evalue, tb = sys.exc_info()
@@ -44,7 +91,7 @@ class CrashReportingProcess(multiprocessing.Process):
         logging.debug('CrashReporter: Done analyzing traceback on process {}'.format(self.name))
         logging.debug('CrashReporter: Sending traceback data to main process'.format(self.name))
         try:
-            self.cr_local_conn.send((etype.__name__, '%s' % evalue, analyzed_traceback))
+            send_payload(self.cr_local_conn, (etype.__name__, '%s' % evalue, analyzed_traceback))
         except Exception as e:
             logging.error('CrashReporter: Could not send traceback data to main process.')
 
@@ -57,4 +104,18 @@ class CrashReportingProcess(multiprocessing.Process):
         except Exception as e:
             logging.info('{cls}: Error encountered in {name}'.format(cls=clsname, name=self.name))
             traceback.print_exc()
-            self.exception_handler(e)
\ No newline at end of file
+            self.exception_handler(e)
+
+def _close_all_pipes():
+    # Release any remaining pipe fds at interpreter exit so crash-looping supervisors do not
+    # leak descriptors across restarts.
+    for remote, local in CrashReportingProcess.cr_pipes:
+        for conn in (remote, local):
+            try:
+                conn.close()
+            except Exception:
+                pass
+    del CrashReportingProcess.cr_pipes[:]
+
+
+atexit.register(_close_all_pipes)
@@ -1,23 +1,122 @@
 __author__ = 'calvin'
 
 import inspect
+import linecache
 import logging
 import re
-import traceback
+from collections import OrderedDict
+
+try:
+    import reprlib
+except ImportError:
+    import repr as reprlib
 from types import FunctionType, MethodType, ModuleType, BuiltinMethodType, BuiltinFunctionType
 
 try:
     import numpy as np
     _NUMPY_INSTALLED = True
+    # Array-likes worth summarizing: ndarrays and the 0-d scalar types share the dtype/shape/
+    # size/min/max protocol. Built once so the isinstance check reuses the same tuple.
+    _NUMPY_TYPES = (np.ndarray, np.generic)
 except ImportError:
     _NUMPY_INSTALLED = False
+    _NUMPY_TYPES = ()
+
+
+# Source listings keyed by code object. inspect.getsourcelines re-reads and re-tokenizes the
+# source file on every call; crashes recurring in the same functions hit the cache instead.
+_source_cache = {}
+
+
+def _getsourcelines(frame):
+    code = frame.f_code
+    try:
+        return _source_cache[code]
+    except KeyError:
+        source = inspect.getsourcelines(frame)
+        _source_cache[code] = source
+        return source
+
+
+obj_ref_regex = re.compile(r"[A-Za-z_]\w*(?:\.[A-Za-z_]\w*)+(?!')(?:\[['\"][^'\"]*['\"]\])*(?:\.[A-Za-z_]\w*)*")
+dict_lookup_regex = re.compile(r"(?<=\[)['\"]([^'\"]*)['\"](?=\])")
+
+DOT_LOOKUP = 0
+DICT_LOOKUP = 1
+
+# Resolved values of these types are implementation, not data, and are excluded from reports.
+_CALLABLE_EXCLUDED = (FunctionType, MethodType, ModuleType, BuiltinMethodType, BuiltinFunctionType)
 
+# Resolution steps are stored pre-bound to the function that applies them, so the lookup loop
+# is a straight call with no per-step branching on the lookup kind.
+_dot_step = getattr
 
-obj_ref_regex = re.compile("[A-z]+[0-9]*\.(?:[A-z]+[0-9]*\.?)+(?!\')(?:\[(?:\'|\").*(?:\'|\")\])*(?:\.[A-z]+[0-9]*)*")
-dict_lookup_regex = re.compile("(?<=\[)(?:\'|\")([^\'\"]*)(?:\'|\")(?=\])")
+
+def _dict_step(scope, key, default):
+    return scope.get(key, default)
+
+
+def _tokenize(s):
+    """
+    Tokenize a dotted/bracketed lookup string in a single left-to-right scan, yielding
+    (lookup type, token) pairs. Stops at the first malformed subscript.
+    """
+    i = 0
+    n = len(s)
+    while i < n:
+        c = s[i]
+        if c == '.':
+            i += 1
+        elif c == '[':
+            quote = s[i + 1] if i + 1 < n else ''
+            if quote != "'" and quote != '"':
+                return
+            end = s.find(quote + ']', i + 2)
+            if end == -1:
+                return
+            yield DICT_LOOKUP, s[i + 2:end]
+            i = end + 2
+        else:
+            j = i + 1
+            while j < n and s[j] != '.' and s[j] != '[':
+                j += 1
+            yield DOT_LOOKUP, s[i:j]
+            i = j
+
+
+# Parsed step programs keyed by lookup string. Crash sites are stable, so the same refs come
+# through repeatedly across frames and reports; the cap just guards against unbounded growth.
+_parse_cache = {}
+
+
+def _parse_refs(s):
+    """
+    Parse a dotted/bracketed lookup string such as "self.data['item'].value" into a list of
+    (step function, token) pairs ready to apply with step(scope, token, default).
+    """
+    try:
+        return _parse_cache[s]
+    except KeyError:
+        if len(_parse_cache) > 1024:
+            _parse_cache.clear()
+        refs = [(_dot_step if kind == DOT_LOOKUP else _dict_step, token)
+                for kind, token in _tokenize(s)]
+        _parse_cache[s] = refs
+        return refs
+
+# Bounded repr. Summarizing the first few container elements and truncating long strings up
+# front beats building a multi-megabyte repr of a huge object only to throw away all but the
+# first max_string_length characters.
+_limited_repr = reprlib.Repr()
+_limited_repr.maxlist = _limited_repr.maxdict = _limited_repr.maxset = _limited_repr.maxtuple = 10
+_limited_repr.maxstring = _limited_repr.maxother = 1000
 
 _repr = repr
 def repr(object):
+    try:
+        return _limited_repr.repr(object)
+    except Exception as e:
+        logging.error(e)
     try:
         return _repr(object)
     except Exception as e:
@@ -25,7 +124,7 @@ def repr(object):
         return 'String Representation not found'
 
 
-def string_variable_lookup(tb, s):
+def string_variable_lookup(tb, s, cache=None):
     """
     Look up the value of an object in a traceback by a dot-lookup string.
     ie. "self.crashreporter.application_name"
@@ -34,39 +133,39 @@ def string_variable_lookup(tb, s):
 
     :param tb: traceback
     :param s: lookup string
+    :param cache: optional dict memoizing resolved reference prefixes, so lookups sharing a
+                  common root (eg. many "self.x.y" refs) resolve each prefix only once per frame
     :return: value of the
     """
 
-    refs = []
-    dot_refs = s.split('.')
-    DOT_LOOKUP = 0
-    DICT_LOOKUP = 1
-    for ii, ref in enumerate(dot_refs):
-        dict_refs = dict_lookup_regex.findall(ref)
-        if dict_refs:
-            bracket = ref.index('[')
-            refs.append((DOT_LOOKUP, ref[:bracket]))
-            refs.extend([(DICT_LOOKUP, t) for t in dict_refs])
-        else:
-            refs.append((DOT_LOOKUP, ref))
-
+    refs = _parse_refs(s)
+    if not refs:
+        # Empty or immediately-malformed lookup string (eg. '' or "[x]")
+        return ValueError
     scope = tb.tb_frame.f_locals.get(refs[0][1], ValueError)
     if scope is ValueError:
         return scope
-    for lookup, ref in refs[1:]:
+    prefix = (refs[0],)
+    for step in refs[1:]:
+        prefix += (step,)
+        if cache is not None and prefix in cache:
+            scope = cache[prefix]
+            if scope is ValueError:
+                return scope
+            continue
+        fn, ref = step
         try:
-            if lookup == DOT_LOOKUP:
-                scope = getattr(scope, ref, ValueError)
-            else:
-                scope = scope.get(ref, ValueError)
+            scope = fn(scope, ref, ValueError)
         except Exception as e:
             logging.error(e)
             scope = ValueError
 
+        if scope is not ValueError and isinstance(scope, _CALLABLE_EXCLUDED):
+            scope = ValueError
+        if cache is not None:
+            cache[prefix] = scope
         if scope is ValueError:
             return scope
-        elif isinstance(scope, (FunctionType, MethodType, ModuleType, BuiltinMethodType, BuiltinFunctionType)):
-            return ValueError
     return scope
 
 
@@ -77,14 +176,19 @@ def get_object_references(tb, source, max_string_length=1000):
     :param tb: traceback
     :return: list of tuples containing (variable name, value)
     """
-    global obj_ref_regex
-    referenced_attr = set()
-    for line in source.split('\n'):
-        referenced_attr.update(set(re.findall(obj_ref_regex, line)))
-    referenced_attr = sorted(referenced_attr)
+    if '.' not in source:
+        # Without a dot there can be no object reference; skip the regex machinery entirely.
+        return []
+    # One scan of the full source beats a fresh regex setup + scan per line; the pattern cannot
+    # match across newlines so the matches are identical. OrderedDict.fromkeys dedupes while
+    # keeping first-seen order, which reads better in reports than a lexical sort.
+    referenced_attr = list(OrderedDict.fromkeys(m.group(0) for m in obj_ref_regex.finditer(source)))
     info = []
+    # Refs in one frame overwhelmingly share prefixes ("self", "self.config", ...); memoizing the
+    # partially-resolved scopes makes the total work linear in the number of distinct steps.
+    prefix_cache = {}
     for attr in referenced_attr:
-        v = string_variable_lookup(tb, attr)
+        v = string_variable_lookup(tb, attr, cache=prefix_cache)
         if v is not ValueError:
             ref_string = format_reference(v, max_string_length=max_string_length)
             info.append((attr, ref_string))
@@ -98,21 +202,35 @@ def get_local_references(tb, max_string_length=1000):
     :param tb: traceback
     :return: list of tuples containing (variable name, value)
     """
-    if 'self' in tb.tb_frame.f_locals:
-        _locals = [('self', repr(tb.tb_frame.f_locals['self']))]
-    else:
-        _locals = []
-    for k, v in tb.tb_frame.f_locals.iteritems():
+    frame_locals = tb.tb_frame.f_locals
+    self_ref = frame_locals.get('self')
+    _locals = [('self', repr(self_ref))] if self_ref is not None else []
+    for k, v in frame_locals.items():
         if k == 'self':
             continue
         try:
-            vstr = format_reference(v, max_string_length=max_string_length)
-            _locals.append((k, vstr))
-        except TypeError:
-            pass
+            _locals.append((k, format_reference(v, max_string_length=max_string_length)))
+        except Exception as e:
+            logging.error(e)
     return _locals
 
 
+def _ndarray_info(ref):
+    """
+    Summarize an ndarray as a list of (attribute, value) pairs.
+    """
+    info = [('dtype', ref.dtype), ('shape', ref.shape), ('size', ref.size)]
+    # min/max are only meaningful for non-empty numeric arrays; object or empty arrays would
+    # just raise for no benefit.
+    if ref.size > 0 and ref.dtype.kind in 'iufc':
+        try:
+            info.append(('min', ref.min()))
+            info.append(('max', ref.max()))
+        except Exception as e:
+            logging.error(e)
+    return info
+
+
 def format_reference(ref, max_string_length=1000):
     """
     Converts an object / value into a string representation to pass along in the payload
@@ -121,20 +239,9 @@ def format_reference(ref, max_string_length=1000):
     :return:
     """
     _pass = lambda *args: None
-    _numpy_info = ('dtype', 'shape', 'size', 'min', 'max')
     additionals = []
-    if _NUMPY_INSTALLED and isinstance(ref, np.ndarray):
-        # Check for numpy info
-        for np_attr in _numpy_info:
-            np_value = getattr(ref, np_attr, None)
-            if np_value is not None:
-                if inspect.isbuiltin(np_value):
-                    try:
-                        np_value = np_value()
-                    except Exception as e:
-                        logging.error(e)
-                        continue
-                additionals.append((np_attr, np_value))
+    if _NUMPY_TYPES and isinstance(ref, _NUMPY_TYPES):
+        additionals = _ndarray_info(ref)
     elif isinstance(ref, (list, tuple, set, dict)):
         # Check for length of reference
         length = getattr(ref, '__len__', _pass)()
@@ -160,24 +267,33 @@ def analyze_traceback(tb, inspection_level=None, limit=None):
     :return: list of dicts containing filepath, line, module, code, traceback level and source code for tracebacks
     """
     info = []
+    # Walk the traceback chain once; everything extract_tb used to provide comes straight off
+    # the frame's code object, and the error line comes from linecache, which keeps a
+    # process-wide cache of read files.
+    tb_levels = []
     tb_level = tb
-    extracted_tb = traceback.extract_tb(tb, limit=limit)
-    for ii, (filepath, line, module, code) in enumerate(extracted_tb):
-        func_source, func_lineno = inspect.getsourcelines(tb_level.tb_frame)
-
+    while tb_level is not None and (limit is None or len(tb_levels) < limit):
+        tb_levels.append(tb_level)
+        tb_level = tb_level.tb_next
+    total = len(tb_levels)
+    for ii, tb_level in enumerate(tb_levels):
+        code_obj = tb_level.tb_frame.f_code
+        filepath = code_obj.co_filename
+        line = tb_level.tb_lineno
         d = {"File": filepath,
              "Error Line Number": line,
-             "Module": module,
-             "Error Line": code,
-             "Module Line Number": func_lineno,
+             "Module": code_obj.co_name,
+             "Error Line": linecache.getline(filepath, line).strip(),
+             "Module Line Number": code_obj.co_firstlineno,
              "Custom Inspection": {},
              "Source Code": ''}
-        if inspection_level is None or len(extracted_tb) - ii <= inspection_level:
-            # Perform advanced inspection on the last `inspection_level` tracebacks.
+        if inspection_level is None or total - ii <= inspection_level:
+            # Perform advanced inspection on the last `inspection_level` tracebacks. Reading the
+            # source is only paid for here, on the frames that actually get inspected.
+            func_source, func_lineno = _getsourcelines(tb_level.tb_frame)
             d['Source Code'] = ''.join(func_source)
             d['Local Variables'] = get_local_references(tb_level)
             d['Object Variables'] = get_object_references(tb_level, d['Source Code'])
-        tb_level = getattr(tb_level, 'tb_next', None)
         info.append(d)
 
     return info
\ No newline at end of file
@@ -1,5 +1,4 @@
 import tempfile
-import time
 import random
 from crashreporter import CrashReporter
 from crashreporter.process import enable_mp_crash_reporting
@@ -14,20 +13,13 @@ cr = CrashReporter(report_dir=tmp, config='./test_config.cfg')
 
 def cp_func():
     n = random.randint(1, 1000)
-    while 1:
-        note = 'This is occuring a separate process'
-        local_var = 'This is a test function that will ultimately fail with a divide by zero error'
-        result = n / 0
-        time.sleep(0.1)
+    note = 'This is occuring a separate process'
+    local_var = 'This is a test function that will ultimately fail with a divide by zero error'
+    result = n / 0
 
 p = multiprocessing.Process(target=cp_func, name='test_crash_on_other_process')
-
-ii = 0
-while 1:
-    if ii == 0:
-        p.start()
-    if cr.poll():
-        break
-    else:
-        time.sleep(0.1)
-    ii += 1
\ No newline at end of file
+p.start()
+# The child crashes on its first pass, so once it has been joined the payload is guaranteed
+# to be waiting in the pipe.
+p.join(timeout=5)
+assert cr.poll(), 'No crash report was received from the child process'